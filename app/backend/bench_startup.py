@@ -0,0 +1,73 @@
+"""Measure backend cold start: import, first /health, and first ready /ready.
+
+Each run is a fresh interpreter so module caches do not hide import cost, and
+uses an empty temporary data directory so the live store is never touched.
+
+    python bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+READY_TIMEOUT_S = 60
+
+_PROBE = r"""
+import json, os, time
+timeout_s = float(os.environ["BENCH_READY_TIMEOUT_S"])
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    t_started = time.perf_counter()
+    assert client.get("/health").status_code == 200
+    t_health = time.perf_counter()
+    deadline = time.perf_counter() + timeout_s
+    while (ready := client.get("/ready")).status_code != 200:
+        if time.perf_counter() > deadline:
+            raise SystemExit(f"/ready not ready after {timeout_s}s: {ready.json()}")
+        time.sleep(0.005)
+    t_ready = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t_import - t0) * 1000,
+    "health_ms": (t_health - t0) * 1000,
+    "ready_ms": (t_ready - t0) * 1000,
+    "startup_ms": (t_started - t0) * 1000,
+}))
+"""
+
+
+def run_once() -> dict:
+    env = dict(os.environ, BENCH_READY_TIMEOUT_S=str(READY_TIMEOUT_S))
+    with tempfile.TemporaryDirectory() as data_dir:
+        env["BACKEND_DATA_DIR"] = data_dir
+        try:
+            out = subprocess.run(
+                [sys.executable, "-c", _PROBE],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                env=env,
+                capture_output=True,
+                text=True,
+                # The probe's own deadline fires first; this only guards a hung import
+                timeout=READY_TIMEOUT_S * 2,
+            )
+        except subprocess.TimeoutExpired:
+            raise SystemExit(f"Startup probe did not finish within {READY_TIMEOUT_S * 2}s")
+    if out.returncode != 0:
+        raise SystemExit(f"Startup probe failed:\n{out.stderr.strip()}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [run_once() for _ in range(runs)]
+    for key in ("import_ms", "startup_ms", "health_ms", "ready_ms"):
+        values = [r[key] for r in results]
+        print(f"{key:>10}: median {statistics.median(values):8.1f}  max {max(values):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+from ollama import ollama_embed_batch
+from scheduler import PRIORITY_QUESTION_EMBED
+
+# ------------------------------
+# Question-embedding coalescer
+# ------------------------------
+# Concurrent /chat requests each need one question embedding. Instead of one
+# tiny Ollama call per request, the first request for a (url, model) pair
+# becomes the leader of a batch: it waits up to the window (or until the batch
+# is full), sends all collected questions in one /api/embed call and hands
+# each waiting request its vector.
+
+EMBED_BATCH_WINDOW_MS = float(os.environ.get("EMBED_BATCH_WINDOW_MS", "10"))
+EMBED_BATCH_MAX_SIZE = int(os.environ.get("EMBED_BATCH_MAX_SIZE", "16"))
+
+BATCH_SIZE_HISTOGRAM = metrics.histogram(
+    "embed_batch_size", [1, 2, 4, 8, 16, 32, 64]
+)
+BATCH_WAIT_HISTOGRAM = metrics.histogram(
+    "embed_batch_wait_ms", [1, 2, 5, 10, 20, 50, 100, 250]
+)
+
+
+class _Pending:
+    __slots__ = ("text", "vector", "done", "enqueued_at")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.vector: Optional[List[float]] = None
+        self.done = threading.Event()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbedBatcher:
+    def __init__(self, window_ms: float, max_batch_size: int):
+        self.window_s = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._batches: Dict[Tuple[str, str], Tuple[List[_Pending], threading.Event]] = {}
+
+    def embed(self, ollama_url: str, model: str, text: str) -> Optional[List[float]]:
+        if self.window_s <= 0 or self.max_batch_size <= 1:
+            vectors = ollama_embed_batch(ollama_url, model, [text], PRIORITY_QUESTION_EMBED)
+            return vectors[0] if vectors else None
+
+        item = _Pending(text)
+        key = (ollama_url, model)
+
+        with self._lock:
+            batch = self._batches.get(key)
+            is_leader = batch is None
+            if is_leader:
+                batch = self._batches[key] = ([], threading.Event())
+            items, full = batch
+            items.append(item)
+            if len(items) >= self.max_batch_size:
+                # Detach so later arrivals start a fresh batch
+                del self._batches[key]
+                full.set()
+
+        if not is_leader:
+            item.done.wait()
+            return item.vector
+
+        full.wait(self.window_s)
+        with self._lock:
+            if self._batches.get(key) is batch:
+                del self._batches[key]
+        self._flush(ollama_url, model, items)
+        return item.vector
+
+    def _flush(self, ollama_url: str, model: str, items: List[_Pending]):
+        sent_at = time.perf_counter()
+        BATCH_SIZE_HISTOGRAM.observe(len(items))
+        for it in items:
+            BATCH_WAIT_HISTOGRAM.observe((sent_at - it.enqueued_at) * 1000.0)
+
+        try:
+            vectors = ollama_embed_batch(
+                ollama_url, model, [it.text for it in items], PRIORITY_QUESTION_EMBED
+            )
+            if vectors is not None:
+                for it, vec in zip(items, vectors):
+                    it.vector = vec
+        finally:
+            for it in items:
+                it.done.set()
+
+
+QUESTION_BATCHER = EmbedBatcher(EMBED_BATCH_WINDOW_MS, EMBED_BATCH_MAX_SIZE)
+
+
+def embed_question(ollama_url: str, model: str, question: str) -> Optional[List[float]]:
+    return QUESTION_BATCHER.embed(ollama_url, model, question)
@@ -1,16 +1,32 @@
+import hmac
 import logging
 import shutil
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import Depends, FastAPI, UploadFile, File, Form, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
+import metrics
+import profiler
+from profiler import profiled
 from rag_utils import *
+from reindex import start_reindex, get_reindex_status, tag_legacy_pdfs
+from startup import BACKEND_WARMUP, readiness, start_warm_up
 from models import Settings
 
 # ------------------------------
 # FastAPI app
 # ------------------------------
-app = FastAPI(title="PDF RAG Backend")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Never block startup: warm-up runs in the background, /ready tracks it
+    if BACKEND_WARMUP:
+        start_warm_up()
+    yield
+
+
+app = FastAPI(title="PDF RAG Backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,24 +36,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def _request_user(request: Request) -> str:
+    # The web UI sends a per-session id; everything reaches us from its host,
+    # so the client address is only a fallback for other callers
+    user_id = request.headers.get("X-User-Id", "").strip()
+    if user_id:
+        return f"user:{user_id}"
+    return f"host:{request.client.host}" if request.client else ""
+
+
 # ------------------------------
 # Routes
 # ------------------------------
 @app.get("/health")
 def health():
+    # Liveness only: must answer even while the vector store is still opening
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    status = readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
+
+
+def _saved_embedding_model() -> str | None:
+    try:
+        with open(SETTING_JSON, "r") as f:
+            return json.load(f).get("embedding_model")
+    except Exception:
+        return None
+
+
 @app.post("/settings", response_model=SaveSettingsResponse)
 def save_settings(req: Settings):
     try:
+        ensure_data_dirs()
+        # PDFs indexed before indexes were tagged were built with the model
+        # being replaced; record that before the setting is overwritten
+        tag_legacy_pdfs(_saved_embedding_model())
         with open(SETTING_JSON, "w") as f:
             json.dump(req.model_dump(), f, indent=2)
     except Exception as e:
         return SaveSettingsResponse(ok=False, error=str(e))
+
+    # Rebuild indexes for the new embedding model; chat keeps using the old
+    # index of each PDF until its re-embedding is done.
+    start_reindex(req.ollama_url, req.embedding_model)
     return SaveSettingsResponse(ok=True)
 
 
+@app.get("/index/status", response_model=ReindexStatus)
+def get_index_status():
+    return ReindexStatus(**get_reindex_status())
+
+
 @app.get("/settings", response_model=Settings)
 def get_settings():
     try:
@@ -55,7 +113,9 @@ def get_settings():
 
 
 @app.post("/pdf/upload", response_model=PDFInfo)
+@profiled("/pdf/upload")
 def upload_pdf(
+    request: Request,
     file: UploadFile = File(...),
     ollama_url: str = Form(...),
     embedding_model: str = Form(...),
@@ -63,6 +123,7 @@ def upload_pdf(
     model: str = Form(...),
 ):
     logging.debug(f"Uploading PDF: {file.filename}")
+    set_current_user(_request_user(request))
     meta = load_metadata()
 
     if file_id in meta.get("pdfs", {}):
@@ -78,30 +139,33 @@ def upload_pdf(
     with open(file_path, "wb") as f_out:
         shutil.copyfileobj(file.file, f_out)
 
-    # Extract pages
-    pages = extract_pdf_pages(file_path)
+    # Extract pages once and persist them; everything below reads the text store
+    store_pdf_text(pdf_id, extract_pdf_pages(file_path))
 
     # Combine first 3–4 pages (or fewer if shorter) for metadata extraction
-    first_pages_text = "\n\n".join(pages[:4])
-    content_metadata = extract_content_metadata_with_llm(first_pages_text, model)
+    first_pages_text = "\n\n".join(load_pdf_pages(pdf_id, limit=4))
+    content_metadata = extract_content_metadata(file_path, first_pages_text, ollama_url, model)
 
     # Index and summarize (both synchronous)
-    index_pdf(pdf_id, pages, ollama_url, embedding_model)
-    summary = summarize_pdf(pages, ollama_url, model)
+    index = index_pdf(pdf_id, ollama_url, embedding_model)
+    summary = summarize_pdf(pdf_id, ollama_url, model)
 
     # Update metadata store
-    if "pdfs" not in meta:
-        meta["pdfs"] = {}
-
-    meta["pdfs"][pdf_id] = {
-        "id": pdf_id,
-        "name": file.filename,
-        "file_path": file_path,
-        "summary": summary,
-        "content_metadata": content_metadata,
-        "chat_history": [],
-    }
-    save_metadata(meta)
+    with METADATA_LOCK:
+        meta = load_metadata()
+        if "pdfs" not in meta:
+            meta["pdfs"] = {}
+
+        meta["pdfs"][pdf_id] = {
+            "id": pdf_id,
+            "name": file.filename,
+            "file_path": file_path,
+            "summary": summary,
+            "content_metadata": content_metadata,
+            "index": index,
+            "chat_history": [],
+        }
+        save_metadata(meta)
 
     logging.debug(f"Uploaded PDF: {file.filename}")
 
@@ -142,8 +206,23 @@ def get_pdf_chat_history(pdf_id: str):
     return ChatHistory(history=pdf.get("chat_history", []))
 
 
+@app.get("/pdf/{pdf_id}/chunk/{page}/{chunk}", response_model=ChunkResponse)
+def get_pdf_chunk(pdf_id: str, page: int, chunk: int):
+    store = open_text_store(pdf_id)
+    if store is None:
+        return ChunkResponse(pdf_id=pdf_id, page=page, chunk=chunk, text=None)
+    with store:
+        try:
+            text = store.get_chunk(page, chunk)
+        except KeyError:
+            text = None
+    return ChunkResponse(pdf_id=pdf_id, page=page, chunk=chunk, text=text)
+
+
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
+@profiled("/chat")
+def chat(req: ChatRequest, request: Request):
+    set_current_user(_request_user(request))
     meta = load_metadata()
     pdf = meta.get("pdfs", {}).get(req.pdf_id)
     if not pdf:
@@ -152,14 +231,18 @@ def chat(req: ChatRequest):
     try:
         answer = rag_answer(req)
 
-        # Append to history
-        history = pdf.get("chat_history", [])
-        history.append({"role": "user", "content": req.question})
-        history.append({"role": "assistant", "content": answer})
-        pdf["chat_history"] = history
+        # Append to history; reload so a re-embedding cutover that happened
+        # while answering is not overwritten
+        with METADATA_LOCK:
+            meta = load_metadata()
+            pdf = meta.get("pdfs", {}).get(req.pdf_id, pdf)
+            history = pdf.get("chat_history", [])
+            history.append({"role": "user", "content": req.question})
+            history.append({"role": "assistant", "content": answer})
+            pdf["chat_history"] = history
 
-        meta["pdfs"][req.pdf_id] = pdf
-        save_metadata(meta)
+            meta.setdefault("pdfs", {})[req.pdf_id] = pdf
+            save_metadata(meta)
 
         return ChatResponse(answer=answer, history=history)
     except Exception as e:
@@ -170,6 +253,63 @@ def chat(req: ChatRequest):
         )
 
 
+# ------------------------------
+# Admin: profiling
+# ------------------------------
+def require_admin(x_admin_token: str = Header(default="")):
+    if not profiler.ADMIN_TOKEN or not hmac.compare_digest(
+        x_admin_token.encode("utf-8"), profiler.ADMIN_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+def start_profile(req: ProfileRequest):
+    try:
+        session = profiler.start_session(
+            req.route,
+            mode=req.mode,
+            max_requests=req.requests,
+            seconds=req.seconds,
+            interval_ms=req.interval_ms,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return session.summary()
+
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+def list_profiles():
+    return {"routes": sorted(profiler.PROFILED_ROUTES), "sessions": profiler.list_sessions()}
+
+
+@app.get("/admin/profile/{session_id}", dependencies=[Depends(require_admin)])
+def get_profile(session_id: int, limit: int = 50, match: str | None = None):
+    session = profiler.get_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown profiling session")
+    return session.report(limit=limit, match=match)
+
+
+@app.get("/admin/profile/{session_id}/collapsed", dependencies=[Depends(require_admin)])
+def get_profile_collapsed(session_id: int):
+    session = profiler.get_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown profiling session")
+    try:
+        return PlainTextResponse(session.collapsed())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.delete("/admin/profile/{session_id}", dependencies=[Depends(require_admin)])
+def stop_profile(session_id: int):
+    session = profiler.stop_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown profiling session")
+    return session.summary()
+
+
 def main():
     import uvicorn
 
@@ -0,0 +1,76 @@
+import bisect
+import threading
+from typing import Dict, List
+
+# ------------------------------
+# In-process metrics
+# ------------------------------
+# Small, dependency-free histograms and gauges; snapshot() backs GET /metrics.
+
+
+class Histogram:
+    def __init__(self, name: str, buckets: List[float]):
+        self.name = name
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets + [float("inf")], self._counts):
+                cumulative += count
+                buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+            return {"count": self._count, "sum": self._sum, "buckets": buckets}
+
+
+class Gauge:
+    def __init__(self, name: str):
+        self.name = name
+        self._values: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, label: str, value: float):
+        with self._lock:
+            self._values[label] = value
+
+    def inc(self, label: str, amount: float = 1):
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+
+_REGISTRY: Dict[str, "Histogram | Gauge"] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def histogram(name: str, buckets: List[float]) -> Histogram:
+    with _REGISTRY_LOCK:
+        if name not in _REGISTRY:
+            _REGISTRY[name] = Histogram(name, buckets)
+        return _REGISTRY[name]
+
+
+def gauge(name: str) -> Gauge:
+    with _REGISTRY_LOCK:
+        if name not in _REGISTRY:
+            _REGISTRY[name] = Gauge(name)
+        return _REGISTRY[name]
+
+
+def snapshot() -> dict:
+    with _REGISTRY_LOCK:
+        metrics = list(_REGISTRY.values())
+    return {m.name: m.snapshot() for m in metrics}
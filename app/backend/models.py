@@ -34,6 +34,26 @@ class SummaryResponse(BaseModel):
     pdf_id: str
     summary: Optional[str] = None
 
+class ChunkResponse(BaseModel):
+    pdf_id: str
+    page: int
+    chunk: int
+    text: Optional[str] = None
+
 class ChatHistory(BaseModel):
     history: List[dict]
 
+
+class ReindexStatus(BaseModel):
+    state: str
+    embedding_model: Optional[str] = None
+    done: int = 0
+    total: int = 0
+    error: Optional[str] = None
+
+class ProfileRequest(BaseModel):
+    route: str
+    mode: str = "cprofile"
+    requests: Optional[int] = None
+    seconds: Optional[float] = None
+    interval_ms: float = 5.0
@@ -1,24 +1,46 @@
+import json
+import threading
+
 import requests
 
 from models import *
+from scheduler import *
+
+_HTTP_SESSION: Optional[requests.Session] = None
+_HTTP_SESSION_LOCK = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    # Created on first use; reuses keep-alive connections to Ollama
+    global _HTTP_SESSION
+
+    if _HTTP_SESSION is None:
+        with _HTTP_SESSION_LOCK:
+            if _HTTP_SESSION is None:
+                _HTTP_SESSION = requests.Session()
+    return _HTTP_SESSION
 
 
 def ollama_list_models(ollama_url: str) -> List[str]:
     try:
-        r = requests.get(f"{ollama_url}/api/tags", timeout=5)
+        with ollama_slot(PRIORITY_CHAT):
+            r = get_http_session().get(f"{ollama_url}/api/tags", timeout=5)
         r.raise_for_status()
         data = r.json()
         return [m["name"] for m in data.get("models", [])]
     except Exception:
         return []
 
-def ollama_embed(ollama_url: str, model: str, text: str) -> Optional[List[float]]:
+def ollama_embed(
+    ollama_url: str, model: str, text: str, priority: int = PRIORITY_INDEXING
+) -> Optional[List[float]]:
     try:
-        r = requests.post(
-            f"{ollama_url}/api/embeddings",
-            json={"model": model, "prompt": text},
-            timeout=60,
-        )
+        with ollama_slot(priority):
+            r = get_http_session().post(
+                f"{ollama_url}/api/embeddings",
+                json={"model": model, "prompt": text},
+                timeout=60,
+            )
         r.raise_for_status()
         data = r.json()
         return data.get("embedding")
@@ -26,16 +48,37 @@ def ollama_embed(ollama_url: str, model: str, text: str) -> Optional[List[float]
         print("Embedding error:", e)
         return None
 
-def ollama_chat(ollama_url: str, model: str, prompt: str) -> str:
-    r = requests.post(
-        f"{ollama_url}/api/chat",
-        json={
-            "model": model,
-            "messages": [{"role": "user", "content": prompt}],
-            "stream": False
-        },
-        timeout=240,
-    )
+def ollama_embed_batch(
+    ollama_url: str, model: str, texts: List[str], priority: int = PRIORITY_INDEXING
+) -> Optional[List[List[float]]]:
+    try:
+        with ollama_slot(priority):
+            r = get_http_session().post(
+                f"{ollama_url}/api/embed",
+                json={"model": model, "input": texts},
+                timeout=60,
+            )
+        r.raise_for_status()
+        data = r.json()
+        embeddings = data.get("embeddings")
+        if not embeddings or len(embeddings) != len(texts):
+            return None
+        return embeddings
+    except Exception as e:
+        print("Embedding error:", e)
+        return None
+
+def ollama_chat(ollama_url: str, model: str, prompt: str, priority: int = PRIORITY_CHAT) -> str:
+    with ollama_slot(priority):
+        r = get_http_session().post(
+            f"{ollama_url}/api/chat",
+            json={
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+                "stream": False
+            },
+            timeout=240,
+        )
     r.raise_for_status()
     data = r.json()
     # Support both streaming-like and single-message schemas
@@ -45,3 +88,27 @@ def ollama_chat(ollama_url: str, model: str, prompt: str) -> str:
         return data["messages"][-1].get("content", "")
     return ""
 
+
+def ollama_generate_json(
+    ollama_url: str, model: str, prompt: str, schema: dict, priority: int = PRIORITY_SUMMARIZE
+) -> dict:
+    # `format` constrains decoding to the schema, so the response always parses
+    with ollama_slot(priority):
+        r = get_http_session().post(
+            f"{ollama_url}/api/generate",
+            json={"model": model, "prompt": prompt, "format": schema, "stream": False},
+            timeout=600,
+        )
+    r.raise_for_status()
+    return json.loads(r.json().get("response", "") or "{}")
+
+def ollama_preload(ollama_url: str, model: str, keep_alive: str, embedding: bool = False):
+    """Load a model into Ollama memory ahead of the first real request."""
+    # Generation models load on an empty prompt; embedding models need an input
+    if embedding:
+        path, payload = "/api/embed", {"model": model, "input": "", "keep_alive": keep_alive}
+    else:
+        path, payload = "/api/generate", {"model": model, "keep_alive": keep_alive}
+    with ollama_slot(PRIORITY_INDEXING):
+        r = get_http_session().post(f"{ollama_url}{path}", json=payload, timeout=600)
+    r.raise_for_status()
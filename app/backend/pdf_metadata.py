@@ -0,0 +1,308 @@
+import re
+import xml.etree.ElementTree as ET
+from typing import TYPE_CHECKING, List, Optional
+
+if TYPE_CHECKING:
+    import fitz
+
+# ------------------------------
+# Deterministic metadata extraction
+# ------------------------------
+# Fills the content-metadata fields from what the PDF already carries: the
+# document info dictionary, XMP, the first-page layout and a few regexes.
+# Only fields still empty afterwards are sent to the LLM.
+
+METADATA_FIELDS = [
+    "title",
+    "authors",
+    "emails",
+    "affiliations",
+    "publication_year",
+    "publisher",
+    "document_type",
+    "abstract",
+    "keywords",
+    "doi",
+]
+LIST_FIELDS = {"authors", "emails", "affiliations", "keywords"}
+
+# If any of these is still missing, the LLM is asked for all missing fields.
+# Keywords are not on the list: many documents have none, and asking for
+# them alone is not worth an LLM round trip.
+REQUIRED_FIELDS = ["title", "authors", "publication_year"]
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+DOI_RE = re.compile(r"\b10\.\d{4,9}/[^\s\"<>]+", re.IGNORECASE)
+YEAR_RE = re.compile(r"\b(19[5-9]\d|20\d\d)\b")
+# Only whole copyright / publication lines; "first published by X in 1998" in
+# running text must not count
+COPYRIGHT_YEAR_RE = re.compile(
+    r"^\s*(?:©|\(c\)|copyright\b)[^\n]{0,40}?\b(19[5-9]\d|20\d\d)\b", re.IGNORECASE | re.MULTILINE
+)
+PUBLISHED_YEAR_RE = re.compile(
+    r"^\s*published(?:\s+online)?\s*:[^\n]{0,30}?\b(19[5-9]\d|20\d\d)\b", re.IGNORECASE | re.MULTILINE
+)
+# A line above the abstract that is nothing but a date, or the arXiv stamp
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+DATE_LINE_RE = re.compile(
+    rf"^\s*(?:\d{{1,2}}\s+)?{_MONTH}\s+(?:\d{{1,2}},?\s+)?(19[5-9]\d|20\d\d)\s*$"
+    r"|^\s*(19[5-9]\d|20\d\d)-\d{2}-\d{2}\s*$"
+    r"|^\s*arXiv:\d{4}\.\d{4,5}(?:v\d+)?\s+\[[^\]]+\]\s+\d{1,2}\s+[A-Za-z]{3}\s+(19[5-9]\d|20\d\d)\s*$",
+    re.IGNORECASE,
+)
+KEYWORDS_RE = re.compile(r"^\s*(?:keywords|key words|index terms)\s*[:—–-]?\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+ABSTRACT_RE = re.compile(
+    r"^\s*abstract\s*[:.—–-]?\s*(.+?)(?=^\s*(?:keywords|key words|index terms|1\.?\s+introduction|introduction)\b|\n\s*\n|\Z)",
+    re.IGNORECASE | re.MULTILINE | re.DOTALL,
+)
+
+# Lines under the title that name people, not places: "Jane Doe1, Rick Roe*"
+NAME_RE = re.compile(r"^[A-Z][\w'’.-]*(?:\s+[A-Z][\w'’.-]*){1,3}$")
+AUTHOR_MARKERS_RE = re.compile(r"[\d*†‡§¶∗]+")
+AUTHOR_BLOCK_END_RE = re.compile(r"^\s*(?:abstract|keywords|key words|index terms|\d?\.?\s*introduction)\b", re.IGNORECASE)
+AFFILIATION_WORDS = {
+    "university", "institute", "department", "dept", "school", "college", "laboratory",
+    "lab", "center", "centre", "faculty", "inc", "ltd", "corporation", "research",
+}
+
+# Titles that authoring tools write into the info dict instead of a real title
+JUNK_TITLE_RE = re.compile(r"^(untitled|microsoft word - .*|.*\.(docx?|pdf|tex|dvi))$", re.IGNORECASE)
+
+XMP_NS = {
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "pdf": "http://ns.adobe.com/pdf/1.3/",
+    "prism": "http://prismstandard.org/namespaces/basic/2.0/",
+}
+
+
+def empty_metadata() -> dict:
+    return {f: [] if f in LIST_FIELDS else "" for f in METADATA_FIELDS}
+
+
+def missing_fields(metadata: dict) -> List[str]:
+    return [f for f in METADATA_FIELDS if not metadata.get(f)]
+
+
+def _split_keywords(value: str) -> List[str]:
+    return [p.strip() for p in re.split(r"[;,]", value) if p.strip()]
+
+
+def _split_authors(value: str) -> List[str]:
+    # "Doe, Jane; Roe, Rick" keeps the commas, "Jane Doe, Rick Roe and Al Poe" does not
+    pattern = r";" if ";" in value else r",|\band\b|&"
+    return [p.strip() for p in re.split(pattern, value) if p.strip()]
+
+
+def _clean_title(value: Optional[str]) -> str:
+    value = (value or "").strip()
+    if not value or JUNK_TITLE_RE.match(value):
+        return ""
+    return value
+
+
+def _xmp_values(root: ET.Element, path: str) -> List[str]:
+    values = []
+    for el in root.iterfind(f".//{path}", XMP_NS):
+        items = el.findall(".//rdf:li", XMP_NS)
+        if items:
+            values.extend((li.text or "").strip() for li in items)
+        elif el.text and el.text.strip():
+            values.append(el.text.strip())
+    return [v for v in values if v]
+
+
+def _from_xmp(doc: "fitz.Document", meta: dict):
+    xml = doc.get_xml_metadata()
+    if not xml:
+        return
+    try:
+        root = ET.fromstring(xml)
+    except ET.ParseError:
+        return
+
+    titles = _xmp_values(root, "dc:title")
+    if not meta["title"] and titles:
+        meta["title"] = _clean_title(titles[0])
+    if not meta["authors"]:
+        meta["authors"] = _xmp_values(root, "dc:creator")
+    if not meta["publisher"]:
+        publishers = _xmp_values(root, "dc:publisher")
+        meta["publisher"] = publishers[0] if publishers else ""
+    if not meta["keywords"]:
+        keywords = _xmp_values(root, "pdf:Keywords") or _xmp_values(root, "dc:subject")
+        meta["keywords"] = [k for kw in keywords for k in _split_keywords(kw)]
+    if not meta["doi"]:
+        for ident in _xmp_values(root, "prism:doi") + _xmp_values(root, "dc:identifier"):
+            match = DOI_RE.search(ident)
+            if match:
+                meta["doi"] = match.group(0)
+                break
+    if not meta["publication_year"]:
+        for date in _xmp_values(root, "prism:publicationDate") + _xmp_values(root, "prism:coverDate"):
+            match = YEAR_RE.search(date)
+            if match:
+                meta["publication_year"] = match.group(1)
+                break
+
+
+def _from_doc_info(doc: "fitz.Document", meta: dict):
+    info = doc.metadata or {}
+    if not meta["title"]:
+        meta["title"] = _clean_title(info.get("title"))
+    if not meta["authors"] and info.get("author"):
+        meta["authors"] = _split_authors(info["author"])
+    if not meta["keywords"] and info.get("keywords"):
+        meta["keywords"] = _split_keywords(info["keywords"])
+
+
+def _title_from_layout(doc: "fitz.Document") -> str:
+    # The largest text on the first page is almost always the title
+    if doc.page_count == 0:
+        return ""
+    spans = []
+    for block in doc[0].get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            for span in line.get("spans", []):
+                text = span.get("text", "").strip()
+                if len(text) > 1:
+                    spans.append((round(span.get("size", 0), 1), text))
+    if not spans:
+        return ""
+    largest = max(size for size, _ in spans)
+    title = " ".join(text for size, text in spans if size == largest)
+    return _clean_title(title) if len(title) <= 300 else ""
+
+
+def _first_page_lines(doc: "fitz.Document") -> List[tuple]:
+    lines = []
+    for block in doc[0].get_text("dict").get("blocks", []):
+        for line in block.get("lines", []):
+            spans = [sp for sp in line.get("spans", []) if sp.get("text", "").strip()]
+            if spans:
+                text = " ".join(sp["text"].strip() for sp in spans)
+                lines.append((round(max(sp.get("size", 0) for sp in spans), 1), text))
+    return lines
+
+
+def _names_in_line(line: str) -> List[str]:
+    names = []
+    for part in _split_authors(AUTHOR_MARKERS_RE.sub(" ", line)):
+        part = " ".join(part.split()).strip(",.")
+        words = {w.lower().strip(".,") for w in part.split()}
+        if not NAME_RE.match(part) or words & AFFILIATION_WORDS:
+            return []
+        names.append(part)
+    return names
+
+
+def _email_corroborates(names: List[str], email_locals: List[str]) -> bool:
+    # "Ashish Vaswani" <-> avaswani@..., "Niki Parmar" <-> nikip@...
+    for name in names:
+        for word in name.lower().split():
+            word = re.sub(r"[^a-z]", "", word)
+            if len(word) >= 3 and any(word in local for local in email_locals):
+                return True
+    return False
+
+
+def _authors_from_layout(doc: "fitz.Document") -> List[str]:
+    # The author block is the run of name-only lines right under the title
+    # (largest font). Places and organisations look like names too ("Google
+    # Brain", "New York City"), so a block is only trusted when page-one emails
+    # match its names, or, with no emails, when the first line lists several
+    # people. Anything else is left to the LLM.
+    if doc.page_count == 0:
+        return []
+    lines = _first_page_lines(doc)
+    if not lines:
+        return []
+    largest = max(size for size, _ in lines)
+    title_end = max(i for i, (size, _) in enumerate(lines) if size == largest)
+
+    email_locals = [
+        e.split("@")[0].lower() for _, text in lines for e in EMAIL_RE.findall(text)
+    ]
+
+    block = []
+    for _, text in lines[title_end + 1:]:
+        if AUTHOR_BLOCK_END_RE.match(text):
+            break
+        remainder = EMAIL_RE.sub(" ", text).strip(" ,;")
+        names = _names_in_line(remainder) if remainder else []
+        if not names:
+            break
+        block.append((text, names))
+        if remainder != text.strip(" ,;"):
+            # Names followed by their email close the block
+            break
+
+    if email_locals:
+        authors = []
+        for _, names in block:
+            if not _email_corroborates(names, email_locals):
+                break
+            authors.extend(names)
+        return list(dict.fromkeys(authors))
+
+    if block:
+        text, names = block[0]
+        if len(names) >= 2:
+            return list(dict.fromkeys(names))
+    return []
+
+
+def _year_from_layout(doc: "fitz.Document") -> str:
+    # A date line in the front matter: "June 2017", "2019-03-12", or the
+    # "arXiv:1706.03762v5 [cs.CL] 6 Dec 2017" stamp
+    if doc.page_count == 0:
+        return ""
+    for _, text in _first_page_lines(doc):
+        if AUTHOR_BLOCK_END_RE.match(text):
+            break
+        match = DATE_LINE_RE.match(text)
+        if match:
+            return next(g for g in match.groups() if g)
+    return ""
+
+
+def _from_text(text: str, meta: dict):
+    if not meta["emails"]:
+        meta["emails"] = list(dict.fromkeys(EMAIL_RE.findall(text)))
+    if not meta["doi"]:
+        match = DOI_RE.search(text)
+        if match:
+            meta["doi"] = match.group(0).rstrip(".,;)")
+    if not meta["publication_year"]:
+        match = COPYRIGHT_YEAR_RE.search(text) or PUBLISHED_YEAR_RE.search(text)
+        if match:
+            meta["publication_year"] = match.group(1)
+    if not meta["keywords"]:
+        match = KEYWORDS_RE.search(text)
+        if match:
+            meta["keywords"] = _split_keywords(match.group(1))
+    if not meta["abstract"]:
+        match = ABSTRACT_RE.search(text)
+        if match:
+            meta["abstract"] = " ".join(match.group(1).split())[:2000]
+
+
+def extract_pdf_metadata(file_path: str, text: str) -> dict:
+    """Metadata the PDF carries itself; `text` is the extracted first pages."""
+    import fitz  # deferred: only uploads need PyMuPDF
+
+    meta = empty_metadata()
+    with fitz.open(file_path) as doc:
+        _from_xmp(doc, meta)
+        _from_doc_info(doc, meta)
+        if not meta["title"]:
+            meta["title"] = _title_from_layout(doc)
+        _from_text(text, meta)
+
+        if not meta["authors"]:
+            meta["authors"] = _authors_from_layout(doc)
+        if not meta["publication_year"]:
+            meta["publication_year"] = _year_from_layout(doc)
+    # No fallback to the info dict's creationDate: that is when the file was
+    # produced, not published, and a wrong year would outrank the text
+    return meta
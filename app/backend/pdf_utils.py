@@ -1,11 +1,19 @@
+import os
 import uuid
-
-import fitz
+from typing import Iterable, Iterator, Tuple
 
 from ollama import *
 from utils import *
+from text_store import open_text_store, write_text_store
+
+CHUNK_MAX_CHARS = 800
+
+# Chunks per /api/embed call when indexing
+INDEX_EMBED_BATCH_SIZE = int(os.environ.get("INDEX_EMBED_BATCH_SIZE", "32"))
 
 def extract_pdf_pages(file_path: str) -> List[str]:
+    import fitz  # deferred: only uploads need PyMuPDF
+
     doc = fitz.open(file_path)
     pages = []
     for page in doc:
@@ -15,7 +23,7 @@ def extract_pdf_pages(file_path: str) -> List[str]:
             pages.append(text)
     return pages
 
-def chunk_text(text: str, max_chars: int = 800) -> List[str]:
+def chunk_text(text: str, max_chars: int = CHUNK_MAX_CHARS) -> List[str]:
     # Simple chunker: split by paragraphs, then pack
     paragraphs = [p.strip() for p in text.split("\n") if p.strip()]
     chunks = []
@@ -31,43 +39,79 @@ def chunk_text(text: str, max_chars: int = 800) -> List[str]:
         chunks.append(current)
     return chunks
 
-def index_pdf(pdf_id: str, pages: List[str], ollama_url: str, embed_model: str):
-    docs = []
-    metadatas = []
-    ids = []
-
+def store_pdf_text(pdf_id: str, pages: List[str], max_chars: int = CHUNK_MAX_CHARS) -> str:
+    """Persist extracted pages and their chunks so later jobs never re-parse the PDF."""
+    chunks = []
     for page_idx, page_text in enumerate(pages):
-        chunks = chunk_text(page_text)
-        for chunk_idx, chunk in enumerate(chunks):
-            emb = ollama_embed(ollama_url, embed_model, chunk)
-            if emb is None:
+        for chunk_idx, chunk in enumerate(chunk_text(page_text, max_chars)):
+            chunks.append((page_idx, chunk_idx, chunk))
+    return write_text_store(pdf_id, pages, chunks, max_chars)
+
+def load_pdf_pages(pdf_id: str, limit: Optional[int] = None) -> List[str]:
+    store = open_text_store(pdf_id)
+    if store is None:
+        return []
+    with store:
+        return store.pages(limit)
+
+def embed_chunk_batches(
+    chunks: Iterable[Tuple[int, int, str]], ollama_url: str, embed_model: str
+) -> Iterator[Tuple[List[Tuple[int, int, str]], Optional[List[List[float]]]]]:
+    """Yield (chunks, embeddings) per batch; embeddings is None if the call failed.
+
+    Uses /api/embed, the same endpoint question embeddings go through.
+    """
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= INDEX_EMBED_BATCH_SIZE:
+            yield batch, ollama_embed_batch(ollama_url, embed_model, [c[2] for c in batch])
+            batch = []
+    if batch:
+        yield batch, ollama_embed_batch(ollama_url, embed_model, [c[2] for c in batch])
+
+def add_chunks(collection, pdf_id: str, batch: List[Tuple[int, int, str]], embeddings: List[List[float]]):
+    collection.add(
+        ids=[f"{pdf_id}_p{page_idx}_c{chunk_idx}_{uuid.uuid4().hex}" for page_idx, chunk_idx, _ in batch],
+        documents=[chunk for _, _, chunk in batch],
+        metadatas=[
+            {"pdf_id": pdf_id, "page": page_idx, "chunk": chunk_idx}
+            for page_idx, chunk_idx, _ in batch
+        ],
+        embeddings=embeddings,
+    )
+
+def index_pdf(pdf_id: str, ollama_url: str, embed_model: str) -> Optional[dict]:
+    """Embed and store all chunks; returns the index descriptor the PDF now lives in."""
+    index = None
+    collection = None
+
+    store = open_text_store(pdf_id)
+    if store is None:
+        return None
+
+    with store:
+        for batch, embeddings in embed_chunk_batches(store.iter_chunks(), ollama_url, embed_model):
+            if embeddings is None:
                 continue
-            doc_id = f"{pdf_id}_p{page_idx}_c{chunk_idx}_{uuid.uuid4().hex}"
-            docs.append(chunk)
-            metadatas.append({
-                "pdf_id": pdf_id,
-                "page": page_idx,
-                "chunk": chunk_idx,
-            })
-            ids.append(doc_id)
-            get_chunk_collection().add(
-                ids=[doc_id],
-                documents=[chunk],
-                metadatas=[metadatas[-1]],
-                embeddings=[emb],
-            )
-
-def summarize_pdf(pages: List[str], ollama_url: str, model: str) -> str:
+            if collection is None:
+                index = {"embedding_model": embed_model, "dimension": len(embeddings[0])}
+                collection = get_index_collection(index)
+            add_chunks(collection, pdf_id, batch, embeddings)
+
+    return index
+
+def summarize_pdf(pdf_id: str, ollama_url: str, model: str) -> str:
     # Use first few pages / limited text for initial summary
-    joined = "\n\n".join(pages[:5])
+    joined = "\n\n".join(load_pdf_pages(pdf_id, limit=5))
     prompt = (
         "You are given the following PDF content. "
         "Write a concise, high-level summary (max 10 bullet points):\n\n"
         f"{joined}"
     )
-    return ollama_chat(ollama_url, model, prompt)
+    return ollama_chat(ollama_url, model, prompt, PRIORITY_SUMMARIZE)
 
 def get_metadata_for_pdf(pdf_id: str):
     db = load_metadata()
-    return db["pdfs"].get(pdf_id, {}).get("metadata", {})
+    return db["pdfs"].get(pdf_id, {}).get("content_metadata", {})
 
@@ -0,0 +1,313 @@
+import cProfile
+import functools
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+# ------------------------------
+# On-demand request profiling
+# ------------------------------
+# Routes wrapped with @profiled(route) can be profiled for their next N
+# requests or for a time window, either with cProfile (exact call stats) or a
+# sampling profiler (stack samples, exportable as collapsed stacks for
+# flamegraph tools). While no session is active the wrapper is a single dict
+# check, so profiling costs nothing when it is off.
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+MODE_CPROFILE = "cprofile"
+MODE_SAMPLING = "sampling"
+
+_MAX_FINISHED_SESSIONS = 20
+
+PROFILED_ROUTES: set = set()
+
+_LOCK = threading.Lock()
+_ACTIVE: Dict[str, "ProfileSession"] = {}
+_SESSIONS: Dict[int, "ProfileSession"] = {}
+_IDS = itertools.count(1)
+
+# cProfile can only be enabled by one thread at a time on newer Pythons
+_CPROFILE_LOCK = threading.Lock()
+
+
+def _frame_label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class ProfileSession:
+    def __init__(
+        self,
+        route: str,
+        mode: str,
+        max_requests: Optional[int],
+        seconds: Optional[float],
+        interval_ms: float,
+    ):
+        self.id = next(_IDS)
+        self.route = route
+        self.mode = mode
+        self.remaining = max_requests
+        self.started_at = time.time()
+        self.until = time.monotonic() + seconds if seconds else None
+        self.interval_s = max(interval_ms, 0.5) / 1000.0
+        self.state = "active"
+        self.requests = 0
+        self.skipped = 0
+
+        self._stats: Optional[pstats.Stats] = None
+        self._samples: Counter = Counter()
+        self._threads: set = set()
+        self._data_lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+        if mode == MODE_SAMPLING:
+            self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.id}", daemon=True)
+            self._sampler.start()
+
+    def expired(self) -> bool:
+        return self.until is not None and time.monotonic() >= self.until
+
+    def run(self, fn: Callable, args, kwargs):
+        if self.mode == MODE_CPROFILE:
+            return self._run_cprofile(fn, args, kwargs)
+        return self._run_sampled(fn, args, kwargs)
+
+    def _run_cprofile(self, fn: Callable, args, kwargs):
+        if not _CPROFILE_LOCK.acquire(blocking=False):
+            # Another request is under cProfile right now; serve this one plain
+            self._unclaim()
+            return fn(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+        finally:
+            _CPROFILE_LOCK.release()
+            with self._data_lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+
+    def _unclaim(self):
+        # Give the claimed request back so "requests" counts profiled ones
+        # only and a max_requests session still profiles that many
+        with _LOCK:
+            self.skipped += 1
+            self.requests -= 1
+            if self.remaining is not None and self.state == "active" and not self.expired():
+                self.remaining += 1
+                # _claim drops the route once the count reaches zero
+                _ACTIVE.setdefault(self.route, self)
+
+    def _run_sampled(self, fn: Callable, args, kwargs):
+        ident = threading.get_ident()
+        with self._data_lock:
+            self._threads.add(ident)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._data_lock:
+                self._threads.discard(ident)
+
+    def _sample_loop(self):
+        while self.state == "active":
+            if self.expired():
+                self.finish()
+                break
+            with self._data_lock:
+                threads = set(self._threads)
+            if threads:
+                frames = sys._current_frames()
+                stacks = []
+                for ident in threads:
+                    frame = frames.get(ident)
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    if stack:
+                        stacks.append(";".join(reversed(stack)))
+                with self._data_lock:
+                    self._samples.update(stacks)
+            time.sleep(self.interval_s)
+
+    def finish(self):
+        self.state = "finished"
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "route": self.route,
+            "mode": self.mode,
+            "state": self.state,
+            "started_at": self.started_at,
+            "requests": self.requests,
+            "skipped": self.skipped,
+            "remaining_requests": self.remaining,
+        }
+
+    def report(self, limit: int = 50, match: Optional[str] = None) -> dict:
+        report = self.summary()
+        if self.mode == MODE_CPROFILE:
+            report["stats"] = self._cprofile_stats(limit, match)
+        else:
+            report["stats"] = self._sampling_stats(limit, match)
+        return report
+
+    def _cprofile_stats(self, limit: int, match: Optional[str]) -> List[dict]:
+        with self._data_lock:
+            if self._stats is None:
+                return []
+            raw = dict(self._stats.stats)
+        rows = []
+        for (filename, line, func), (cc, nc, tt, ct, _) in raw.items():
+            name = f"{os.path.basename(filename)}:{line}({func})"
+            if match and match not in name:
+                continue
+            rows.append({
+                "function": name,
+                "ncalls": nc,
+                "primitive_calls": cc,
+                "tottime": tt,
+                "cumtime": ct,
+            })
+        rows.sort(key=lambda r: r["cumtime"], reverse=True)
+        return rows[:limit]
+
+    def _sampling_stats(self, limit: int, match: Optional[str]) -> List[dict]:
+        with self._data_lock:
+            samples = dict(self._samples)
+        own = Counter()
+        total = Counter()
+        for stack, count in samples.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                total[name] += count
+        rows = [
+            {"function": name, "samples": total[name], "self_samples": own[name]}
+            for name in total
+            if not match or match in name
+        ]
+        rows.sort(key=lambda r: r["samples"], reverse=True)
+        return rows[:limit]
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format: "a;b;c count" per line."""
+        if self.mode != MODE_SAMPLING:
+            # cProfile only records caller/callee pairs, not whole stacks
+            raise ValueError("Collapsed stacks need a sampling session; start one with mode=sampling")
+        with self._data_lock:
+            samples = dict(self._samples)
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(samples.items()))
+
+
+def start_session(
+    route: str,
+    mode: str = MODE_CPROFILE,
+    max_requests: Optional[int] = None,
+    seconds: Optional[float] = None,
+    interval_ms: float = 5.0,
+) -> ProfileSession:
+    if route not in PROFILED_ROUTES:
+        raise ValueError(f"Route {route} is not profiled; choose from {sorted(PROFILED_ROUTES)}")
+    if mode not in (MODE_CPROFILE, MODE_SAMPLING):
+        raise ValueError(f"Unknown profiling mode {mode}")
+    if not max_requests and not seconds:
+        raise ValueError("Set max_requests or seconds")
+
+    with _LOCK:
+        previous = _ACTIVE.pop(route, None)
+        if previous:
+            previous.finish()
+        session = ProfileSession(route, mode, max_requests, seconds, interval_ms)
+        _ACTIVE[route] = session
+        _SESSIONS[session.id] = session
+
+        finished = [s.id for s in _SESSIONS.values() if s.state == "finished"]
+        for old_id in finished[:-_MAX_FINISHED_SESSIONS]:
+            del _SESSIONS[old_id]
+    return session
+
+
+def stop_session(session_id: int) -> Optional[ProfileSession]:
+    with _LOCK:
+        session = _SESSIONS.get(session_id)
+        if session and _ACTIVE.get(session.route) is session:
+            del _ACTIVE[session.route]
+    if session:
+        session.finish()
+    return session
+
+
+def get_session(session_id: int) -> Optional[ProfileSession]:
+    session = _SESSIONS.get(session_id)
+    if session and session.state == "active" and session.expired():
+        stop_session(session_id)
+    return session
+
+
+def list_sessions() -> List[dict]:
+    for session_id in list(_SESSIONS):
+        get_session(session_id)
+    return [s.summary() for s in _SESSIONS.values()]
+
+
+def _claim(route: str) -> Optional[ProfileSession]:
+    with _LOCK:
+        session = _ACTIVE.get(route)
+        if session is None:
+            return None
+        if session.expired() or (session.remaining is not None and session.remaining <= 0):
+            del _ACTIVE[route]
+            session.finish()
+            return None
+        if session.remaining is not None:
+            session.remaining -= 1
+        session.requests += 1
+        if session.remaining == 0:
+            # Last profiled request; later ones run unprofiled
+            del _ACTIVE[route]
+    return session
+
+
+def _release(session: ProfileSession):
+    with _LOCK:
+        done = session.remaining == 0 and session.route not in _ACTIVE
+    if done:
+        with session._data_lock:
+            busy = bool(session._threads)
+        if not busy:
+            session.finish()
+
+
+def profiled(route: str):
+    """Make a route handler profileable; must run in the handler's thread."""
+    PROFILED_ROUTES.add(route)
+
+    def decorator(fn: Callable):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _ACTIVE:
+                return fn(*args, **kwargs)
+            session = _claim(route)
+            if session is None:
+                return fn(*args, **kwargs)
+            try:
+                return session.run(fn, args, kwargs)
+            finally:
+                _release(session)
+
+        return wrapper
+
+    return decorator
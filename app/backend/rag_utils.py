@@ -1,4 +1,8 @@
+import logging
+
 from pdf_utils import *
+from pdf_metadata import LIST_FIELDS, REQUIRED_FIELDS, extract_pdf_metadata, missing_fields
+from embed_batcher import embed_question
 
 
 def build_rag_prompt(metadata: dict, context_chunks: list[str], question: str) -> str:
@@ -37,13 +41,26 @@ Answer:
     return prompt
 
 def rag_answer(req: ChatRequest) -> str:
-    # Embed question
-    q_emb = ollama_embed(req.ollama_url, req.embedding_model, req.question)
+    # Route to the index this PDF currently lives in. Until a re-embedding job
+    # cuts it over, questions are embedded with the model that built the index.
+    pdf = load_metadata().get("pdfs", {}).get(req.pdf_id, {})
+    index = pdf.get("index")
+    embed_model = index["embedding_model"] if index else req.embedding_model
+
+    # Embed question; coalesced with concurrent chats into one batched call.
+    # The legacy collection uses L2 distance, where the normalized vectors of
+    # the batch endpoint would rank differently, so it keeps single requests.
+    if index and not index.get("legacy"):
+        q_emb = embed_question(req.ollama_url, embed_model, req.question)
+    else:
+        q_emb = ollama_embed(req.ollama_url, embed_model, req.question, PRIORITY_QUESTION_EMBED)
     if q_emb is None:
         return "Could not generate embeddings for question."
+    if index and index["dimension"] is not None and len(q_emb) != index["dimension"]:
+        return "Embedding dimension does not match the index for this PDF."
 
     # Query Chroma
-    results = get_chunk_collection().query(
+    results = get_index_collection(index).query(
         query_embeddings=[q_emb],
         n_results=5,
         where={"pdf_id": req.pdf_id},
@@ -54,29 +71,42 @@ def rag_answer(req: ChatRequest) -> str:
     prompt = build_rag_prompt(get_metadata_for_pdf(req.pdf_id), contexts, req.question)
     return ollama_chat(req.ollama_url, req.model, prompt)
 
-def extract_content_metadata_with_llm(text: str, model: str):
+def extract_content_metadata(file_path: str, text: str, ollama_url: str, model: str) -> dict:
+    metadata = extract_pdf_metadata(file_path, text)
+
+    # Only pay for an LLM round trip when a core field could not be found
+    missing = missing_fields(metadata)
+    if any(f in missing for f in REQUIRED_FIELDS):
+        try:
+            found = extract_content_metadata_with_llm(text, ollama_url, model, missing)
+        except Exception as e:
+            logging.debug(f"LLM metadata extraction failed: {e}")
+            found = {}
+        for field in missing:
+            if found.get(field):
+                metadata[field] = found[field]
+
+    return metadata
+
+def extract_content_metadata_with_llm(text: str, ollama_url: str, model: str, fields: List[str]) -> dict:
+    schema = {
+        "type": "object",
+        "properties": {
+            f: {"type": "array", "items": {"type": "string"}} if f in LIST_FIELDS else {"type": "string"}
+            for f in fields
+        },
+        "required": fields,
+    }
+
     prompt = (
         "You are an expert at extracting metadata from documents.\n"
         "Given the text below (from the first pages of a PDF), extract structured metadata.\n"
-        "Return ONLY valid JSON with these fields:\n\n"
-        """{{
-          "title": "",
-          "authors": [],
-          "emails": [],
-          "affiliations": [],
-          "publication_year": "",
-          "publisher": "",
-          "document_type": "",
-          "abstract": "",
-          "keywords": []
-        }}"""
+        f"Return JSON with exactly these fields: {', '.join(fields)}\n\n"
 
         "Rules:\n"
         "- If a field is missing, return an empty string or empty list.\n"
         "- Do NOT invent information.\n"
-        "- Do NOT include commentary.\n"
-        "- Do NOT include extra fields.\n"
-        "- Return ONLY JSON.\n\n"
+        "- Do NOT include commentary.\n\n"
 
         "Text:\n"
         "<<<\n"
@@ -84,18 +114,5 @@ def extract_content_metadata_with_llm(text: str, model: str):
         ">>>\n"
     )
 
-    response = requests.post(
-        "http://localhost:11434/api/generate",
-        json={"model": model, "prompt": prompt, "stream": False},
-        timeout=600
-    )
-
-    raw = response.json().get("response", "").strip()
-
-    # Ensure valid JSON
-    try:
-        metadata = json.loads(raw)
-    except:
-        metadata = {}
-
-    return metadata
+    metadata = ollama_generate_json(ollama_url, model, prompt, schema)
+    return metadata if isinstance(metadata, dict) else {}
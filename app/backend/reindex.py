@@ -0,0 +1,183 @@
+import logging
+import threading
+from typing import Iterator, Tuple
+
+from pdf_utils import *
+
+# ------------------------------
+# Background re-embedding
+# ------------------------------
+# When the embedding model changes, every PDF is rebuilt into the index for
+# the new model from its persisted text store (or, for older uploads, the
+# chunk text in its current index), so PDFs are never re-parsed. Each PDF
+# keeps answering from its old index until its new vectors are complete, then
+# metadata.json is cut over. Every job gets a generation number; starting a
+# new job supersedes the old one, which stops before the new one begins.
+
+_REINDEX_LOCK = threading.Lock()
+_REINDEX_THREAD: threading.Thread | None = None
+_REINDEX_TARGET: str | None = None
+_REINDEX_GENERATION = 0
+
+REINDEX_STATUS = {
+    "state": "idle",
+    "embedding_model": None,
+    "done": 0,
+    "total": 0,
+    "error": None,
+}
+
+
+def get_reindex_status() -> dict:
+    return dict(REINDEX_STATUS)
+
+
+def tag_legacy_pdfs(embedding_model: str | None) -> int:
+    """Record which model built untagged (legacy collection) PDFs.
+
+    Must run before the embedding model setting changes, so chat keeps
+    embedding questions for these PDFs with the model their vectors came from.
+    """
+    if not embedding_model:
+        return 0
+
+    tagged = 0
+    with METADATA_LOCK:
+        meta = load_metadata()
+        for pdf in meta.get("pdfs", {}).values():
+            if not pdf.get("index"):
+                pdf["index"] = legacy_index(embedding_model)
+                tagged += 1
+        if tagged:
+            save_metadata(meta)
+    return tagged
+
+
+def start_reindex(ollama_url: str, embedding_model: str) -> bool:
+    """Start re-embedding in the background; returns False if nothing needs it."""
+    global _REINDEX_THREAD, _REINDEX_TARGET, _REINDEX_GENERATION
+
+    if not embedding_model:
+        return False
+
+    pending = _pdfs_needing_reindex(embedding_model)
+
+    with _REINDEX_LOCK:
+        if _REINDEX_TARGET == embedding_model and _REINDEX_THREAD and _REINDEX_THREAD.is_alive():
+            return True
+        if not pending:
+            return False
+
+        # The running job sees a newer generation and stops at its next check
+        _REINDEX_GENERATION += 1
+        _REINDEX_TARGET = embedding_model
+        REINDEX_STATUS.update(
+            state="running",
+            embedding_model=embedding_model,
+            done=0,
+            total=len(pending),
+            error=None,
+        )
+        _REINDEX_THREAD = threading.Thread(
+            target=_reindex_all,
+            args=(ollama_url, embedding_model, _REINDEX_GENERATION, _REINDEX_THREAD),
+            name="reindex",
+            daemon=True,
+        )
+        _REINDEX_THREAD.start()
+    return True
+
+
+def _superseded(generation: int | None) -> bool:
+    return generation is not None and generation != _REINDEX_GENERATION
+
+
+def _pdfs_needing_reindex(embedding_model: str) -> List[str]:
+    pending = []
+    for pdf_id, pdf in load_metadata().get("pdfs", {}).items():
+        index = pdf.get("index")
+        if not index or index["embedding_model"] != embedding_model:
+            pending.append(pdf_id)
+    return pending
+
+
+def _reindex_all(
+    ollama_url: str,
+    embedding_model: str,
+    generation: int,
+    previous: threading.Thread | None,
+):
+    # Never overlap with a superseded job: both would write the same PDFs
+    if previous is not None:
+        previous.join()
+
+    for pdf_id in _pdfs_needing_reindex(embedding_model):
+        if _superseded(generation):
+            logging.debug(f"Re-embedding job {generation} for {embedding_model} superseded")
+            return
+        try:
+            reembed_pdf(pdf_id, ollama_url, embedding_model, generation)
+        except Exception as e:
+            logging.exception(f"Re-embedding failed for PDF {pdf_id}")
+            if not _superseded(generation):
+                REINDEX_STATUS["error"] = str(e)
+        if not _superseded(generation):
+            REINDEX_STATUS["done"] += 1
+
+    if not _superseded(generation):
+        REINDEX_STATUS["state"] = "failed" if REINDEX_STATUS["error"] else "done"
+
+
+def _stored_chunks(pdf_id: str, old_collection) -> Iterator[Tuple[int, int, str]]:
+    store = open_text_store(pdf_id)
+    if store is not None:
+        with store:
+            yield from store.iter_chunks()
+        return
+
+    # PDFs uploaded before the text store existed: reuse the chunk text in Chroma
+    stored = old_collection.get(where={"pdf_id": pdf_id}, include=["documents", "metadatas"])
+    for doc, chunk_meta in zip(stored.get("documents") or [], stored.get("metadatas") or []):
+        yield chunk_meta["page"], chunk_meta["chunk"], doc
+
+
+def reembed_pdf(
+    pdf_id: str, ollama_url: str, embedding_model: str, generation: int | None = None
+) -> Optional[dict]:
+    pdf = load_metadata().get("pdfs", {}).get(pdf_id)
+    if not pdf:
+        return None
+
+    old_index = pdf.get("index")
+    old_collection = get_index_collection(old_index)
+
+    new_index = None
+    new_collection = None
+    for batch, embeddings in embed_chunk_batches(_stored_chunks(pdf_id, old_collection), ollama_url, embedding_model):
+        if _superseded(generation):
+            return None
+        if embeddings is None:
+            raise RuntimeError(f"Could not embed chunks with {embedding_model}")
+        if new_collection is None:
+            new_index = {"embedding_model": embedding_model, "dimension": len(embeddings[0])}
+            new_collection = get_index_collection(new_index)
+            # Drop leftovers from an interrupted earlier run
+            new_collection.delete(where={"pdf_id": pdf_id})
+        add_chunks(new_collection, pdf_id, batch, embeddings)
+
+    if new_index is None:
+        return None
+
+    # Cut over: from here on chat for this PDF uses the new index
+    with METADATA_LOCK:
+        meta = load_metadata()
+        current = meta.get("pdfs", {}).get(pdf_id)
+        if current is None or _superseded(generation):
+            new_collection.delete(where={"pdf_id": pdf_id})
+            return None
+        current["index"] = new_index
+        save_metadata(meta)
+
+    old_collection.delete(where={"pdf_id": pdf_id})
+    logging.debug(f"Re-embedded PDF {pdf_id} with {embedding_model}")
+    return new_index
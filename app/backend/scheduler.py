@@ -0,0 +1,123 @@
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict
+
+import metrics
+
+# ------------------------------
+# Ollama traffic scheduler
+# ------------------------------
+# Every call to Ollama takes a slot here first. Waiting calls are granted in
+# priority-class order (interactive chat first, bulk indexing last), each class
+# has its own concurrency limit so ingestion can never occupy every slot, and
+# within a class users are served round-robin so one large upload does not
+# starve another user's requests.
+
+PRIORITY_CHAT = 0
+PRIORITY_QUESTION_EMBED = 1
+PRIORITY_SUMMARIZE = 2
+PRIORITY_INDEXING = 3
+
+PRIORITY_NAMES = {
+    PRIORITY_CHAT: "chat",
+    PRIORITY_QUESTION_EMBED: "question_embed",
+    PRIORITY_SUMMARIZE: "summarize",
+    PRIORITY_INDEXING: "indexing",
+}
+
+OLLAMA_MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "4"))
+OLLAMA_CLASS_LIMITS = {
+    PRIORITY_CHAT: int(os.environ.get("OLLAMA_CHAT_CONCURRENCY", "4")),
+    PRIORITY_QUESTION_EMBED: int(os.environ.get("OLLAMA_QUESTION_EMBED_CONCURRENCY", "4")),
+    PRIORITY_SUMMARIZE: int(os.environ.get("OLLAMA_SUMMARIZE_CONCURRENCY", "1")),
+    PRIORITY_INDEXING: int(os.environ.get("OLLAMA_INDEXING_CONCURRENCY", "1")),
+}
+
+QUEUE_DEPTH = metrics.gauge("ollama_queue_depth")
+IN_FLIGHT = metrics.gauge("ollama_in_flight")
+QUEUE_WAIT_HISTOGRAMS = {
+    p: metrics.histogram(f"ollama_queue_wait_ms_{name}", [1, 10, 50, 100, 500, 1000, 5000, 30000])
+    for p, name in PRIORITY_NAMES.items()
+}
+
+# Who the current request is for; routes set it, background jobs keep the default
+CURRENT_USER: contextvars.ContextVar[str] = contextvars.ContextVar("ollama_user", default="background")
+
+
+def set_current_user(user: str):
+    CURRENT_USER.set(user or "background")
+
+
+class OllamaScheduler:
+    def __init__(self, max_concurrency: int, class_limits: Dict[int, int]):
+        self.max_concurrency = max(1, max_concurrency)
+        self.class_limits = {p: max(1, limit) for p, limit in class_limits.items()}
+        self._cond = threading.Condition()
+        self._in_flight_total = 0
+        self._in_flight = {p: 0 for p in self.class_limits}
+        # priority -> user -> FIFO of tickets; dict order is the round-robin order
+        self._waiting: Dict[int, "OrderedDict[str, deque]"] = {p: OrderedDict() for p in self.class_limits}
+
+        for p, name in PRIORITY_NAMES.items():
+            QUEUE_DEPTH.set(name, 0)
+            IN_FLIGHT.set(name, 0)
+
+    def acquire(self, priority: int, user: str):
+        ticket = object()
+        enqueued_at = time.perf_counter()
+        name = PRIORITY_NAMES[priority]
+
+        with self._cond:
+            self._waiting[priority].setdefault(user, deque()).append(ticket)
+            QUEUE_DEPTH.inc(name)
+            while self._next_ticket() is not ticket:
+                self._cond.wait()
+            self._grant(priority, user)
+            # Another waiter may now be eligible (different class, free slots)
+            self._cond.notify_all()
+
+        QUEUE_DEPTH.inc(name, -1)
+        IN_FLIGHT.inc(name)
+        QUEUE_WAIT_HISTOGRAMS[priority].observe((time.perf_counter() - enqueued_at) * 1000.0)
+
+    def release(self, priority: int):
+        with self._cond:
+            self._in_flight_total -= 1
+            self._in_flight[priority] -= 1
+            self._cond.notify_all()
+        IN_FLIGHT.inc(PRIORITY_NAMES[priority], -1)
+
+    def _next_ticket(self):
+        if self._in_flight_total >= self.max_concurrency:
+            return None
+        for p in sorted(self._waiting):
+            users = self._waiting[p]
+            if users and self._in_flight[p] < self.class_limits[p]:
+                return next(iter(users.values()))[0]
+        return None
+
+    def _grant(self, priority: int, user: str):
+        users = self._waiting[priority]
+        queue = users.pop(user)
+        queue.popleft()
+        if queue:
+            # Back of the line: the next grant in this class goes to another user
+            users[user] = queue
+        self._in_flight_total += 1
+        self._in_flight[priority] += 1
+
+
+SCHEDULER = OllamaScheduler(OLLAMA_MAX_CONCURRENCY, OLLAMA_CLASS_LIMITS)
+
+
+@contextmanager
+def ollama_slot(priority: int):
+    SCHEDULER.acquire(priority, CURRENT_USER.get())
+    try:
+        yield
+    finally:
+        SCHEDULER.release(priority)
@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from ollama import ollama_preload
+from utils import SETTING_JSON, initialize_vector_store, is_vector_store_ready
+
+# ------------------------------
+# Background warm-up and readiness
+# ------------------------------
+# Nothing heavy happens at import time: the vector store and HTTP session are
+# created on first use. With BACKEND_WARMUP enabled, startup instead opens the
+# store in a background thread and asks Ollama to load the saved models, so the
+# first real request does not pay for either. /ready reflects this state.
+
+BACKEND_WARMUP = os.environ.get("BACKEND_WARMUP", "1") not in ("0", "false", "no")
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+WARMUP_STATUS = {
+    "state": "idle",
+    "vector_store_ms": None,
+    "models": {},
+    "error": None,
+}
+_WARMUP_LOCK = threading.Lock()
+
+
+def start_warm_up() -> bool:
+    with _WARMUP_LOCK:
+        if WARMUP_STATUS["state"] != "idle":
+            return False
+        WARMUP_STATUS["state"] = "running"
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    return True
+
+
+def _warm_up():
+    started = time.perf_counter()
+    try:
+        initialize_vector_store()
+        WARMUP_STATUS["vector_store_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+    except Exception as e:
+        logging.exception("Vector store warm-up failed")
+        WARMUP_STATUS["error"] = str(e)
+
+    # Model preloading is best effort; readiness only depends on the store
+    WARMUP_STATUS["state"] = "done"
+    _preload_saved_models()
+
+
+def _preload_saved_models():
+    try:
+        with open(SETTING_JSON, "r") as f:
+            settings = json.load(f)
+    except Exception:
+        return
+
+    ollama_url = settings.get("ollama_url")
+    targets = [(settings.get("model"), False), (settings.get("embedding_model"), True)]
+    for model, embedding in targets:
+        if not ollama_url or not model:
+            continue
+        try:
+            ollama_preload(ollama_url, model, OLLAMA_KEEP_ALIVE, embedding=embedding)
+            WARMUP_STATUS["models"][model] = "loaded"
+        except Exception as e:
+            logging.debug(f"Could not preload {model}: {e}")
+            WARMUP_STATUS["models"][model] = "failed"
+
+
+def readiness() -> dict:
+    # Without warm-up the probe itself is the first use; after a failed
+    # initialization (even one that got as far as opening the client) every
+    # probe retries, so a transient error does not leave the backend unready
+    warming = WARMUP_STATUS["state"] == "running"
+    if not warming and (not is_vector_store_ready() or WARMUP_STATUS["error"] is not None):
+        try:
+            initialize_vector_store()
+            WARMUP_STATUS["error"] = None
+        except Exception as e:
+            WARMUP_STATUS["error"] = str(e)
+
+    return {
+        "ready": not warming and is_vector_store_ready() and WARMUP_STATUS["error"] is None,
+        "vector_store": is_vector_store_ready(),
+        "warm_up": dict(WARMUP_STATUS, models=dict(WARMUP_STATUS["models"])),
+    }
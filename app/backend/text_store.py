@@ -0,0 +1,136 @@
+import mmap
+import os
+import struct
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+from utils import TEXT_DIR
+
+# ------------------------------
+# Extracted-text store
+# ------------------------------
+# One file per PDF, written once at upload so reindexing, summarizing and
+# re-chunking never have to reopen the PDF. Every page and chunk is zlib
+# compressed on its own, so a single record can be read through mmap without
+# touching the rest of the file.
+#
+# Layout (little endian):
+#   magic        8s    b"PDFTXT1\0"
+#   header       III   page_count, chunk_count, chunk_max_chars
+#   page table   QI    offset, length            (page_count entries)
+#   chunk table  IIQI  page, chunk, offset, length (chunk_count entries,
+#                      sorted by page then chunk)
+#   blobs              compressed UTF-8 text
+
+MAGIC = b"PDFTXT1\0"
+_HEADER = struct.Struct("<8sIII")
+_PAGE_ENTRY = struct.Struct("<QI")
+_CHUNK_ENTRY = struct.Struct("<IIQI")
+
+
+def text_store_path(pdf_id: str) -> str:
+    return os.path.join(TEXT_DIR, f"{pdf_id}.txtstore")
+
+
+def write_text_store(
+    pdf_id: str,
+    pages: List[str],
+    chunks: List[Tuple[int, int, str]],
+    chunk_max_chars: int,
+) -> str:
+    """Persist pages and (page, chunk, text) triples; returns the file path."""
+    chunks = sorted(chunks, key=lambda c: (c[0], c[1]))
+    page_blobs = [zlib.compress(p.encode("utf-8")) for p in pages]
+    chunk_blobs = [zlib.compress(c.encode("utf-8")) for _, _, c in chunks]
+
+    offset = _HEADER.size + len(pages) * _PAGE_ENTRY.size + len(chunks) * _CHUNK_ENTRY.size
+    page_table = []
+    for blob in page_blobs:
+        page_table.append(_PAGE_ENTRY.pack(offset, len(blob)))
+        offset += len(blob)
+    chunk_table = []
+    for (page_idx, chunk_idx, _), blob in zip(chunks, chunk_blobs):
+        chunk_table.append(_CHUNK_ENTRY.pack(page_idx, chunk_idx, offset, len(blob)))
+        offset += len(blob)
+
+    path = text_store_path(pdf_id)
+    os.makedirs(TEXT_DIR, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(pages), len(chunks), chunk_max_chars))
+        f.writelines(page_table)
+        f.writelines(chunk_table)
+        f.writelines(page_blobs)
+        f.writelines(chunk_blobs)
+    os.replace(tmp_path, path)
+    return path
+
+
+class TextStore:
+    """Read-only, memory-mapped view of one PDF's extracted text."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.page_count, self.chunk_count, self.chunk_max_chars = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Not a text store: {path}")
+
+        self._pages_at = _HEADER.size
+        self._chunks_at = self._pages_at + self.page_count * _PAGE_ENTRY.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._mm.close()
+
+    def _read(self, offset: int, length: int) -> str:
+        return zlib.decompress(self._mm[offset:offset + length]).decode("utf-8")
+
+    def get_page(self, page_idx: int) -> str:
+        if not 0 <= page_idx < self.page_count:
+            raise IndexError(page_idx)
+        offset, length = _PAGE_ENTRY.unpack_from(self._mm, self._pages_at + page_idx * _PAGE_ENTRY.size)
+        return self._read(offset, length)
+
+    def _chunk_entry(self, i: int) -> Tuple[int, int, int, int]:
+        return _CHUNK_ENTRY.unpack_from(self._mm, self._chunks_at + i * _CHUNK_ENTRY.size)
+
+    def get_chunk(self, page_idx: int, chunk_idx: int) -> str:
+        # The chunk table is written sorted by (page, chunk): binary search it
+        # in place so a lookup never reads the whole table
+        key = (page_idx, chunk_idx)
+        lo, hi = 0, self.chunk_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._chunk_entry(mid)[:2] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.chunk_count:
+            entry_page, entry_chunk, offset, length = self._chunk_entry(lo)
+            if (entry_page, entry_chunk) == key:
+                return self._read(offset, length)
+        raise KeyError(key)
+
+    def pages(self, limit: Optional[int] = None) -> List[str]:
+        count = self.page_count if limit is None else min(limit, self.page_count)
+        return [self.get_page(i) for i in range(count)]
+
+    def iter_chunks(self) -> Iterator[Tuple[int, int, str]]:
+        for i in range(self.chunk_count):
+            page_idx, chunk_idx, offset, length = self._chunk_entry(i)
+            yield page_idx, chunk_idx, self._read(offset, length)
+
+
+def open_text_store(pdf_id: str) -> Optional[TextStore]:
+    path = text_store_path(pdf_id)
+    if not os.path.exists(path):
+        return None
+    return TextStore(path)
@@ -1,58 +1,109 @@
+import hashlib
 import json
 import os
+import re
+import threading
+from typing import TYPE_CHECKING
 
-import chromadb
-from chromadb.config import Settings
-from chromadb.api import ClientAPI
+# chromadb is imported on first use: it dominates backend import time
+if TYPE_CHECKING:
+    from chromadb.api import ClientAPI
 
 # ------------------------------
 # Paths and basic setup
 # ------------------------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "data")
+DATA_DIR = os.environ.get("BACKEND_DATA_DIR") or os.path.join(BASE_DIR, "data")
 PDF_DIR = os.path.join(DATA_DIR, "pdfs")
 CHROMA_DIR = os.path.join(DATA_DIR, "chroma")
+TEXT_DIR = os.path.join(DATA_DIR, "text")
 META_FILE = os.path.join(DATA_DIR, "metadata.json")
 SETTING_JSON = os.path.join(DATA_DIR, "settings.json")
 
 COLLECTION_NAME = "pdf_chunks"
-CHROMA_CLIENT: ClientAPI | None = None
+CHROMA_CLIENT: "ClientAPI | None" = None
+_INIT_LOCK = threading.Lock()
+_DATA_DIRS_READY = False
+
+# Guards read-modify-write cycles on metadata.json (chat, upload, re-embedding)
+METADATA_LOCK = threading.RLock()
 
 def load_metadata():
+    ensure_data_dirs()
     with open(META_FILE, "r", encoding="utf-8") as f:
         return json.load(f)
 
 def save_metadata(meta):
+    ensure_data_dirs()
     with open(META_FILE, "w", encoding="utf-8") as f:
         json.dump(meta, f, indent=2)
 
-def get_chroma_client() -> chromadb.PersistentClient:
+def get_chroma_client() -> "ClientAPI":
     global CHROMA_CLIENT
 
     if CHROMA_CLIENT is None:
-        CHROMA_CLIENT = chromadb.PersistentClient(
-            path=CHROMA_DIR,
-            settings=Settings(allow_reset=False),
-        )
+        with _INIT_LOCK:
+            if CHROMA_CLIENT is None:
+                import chromadb
+                from chromadb.config import Settings
+
+                ensure_data_dirs()
+                CHROMA_CLIENT = chromadb.PersistentClient(
+                    path=CHROMA_DIR,
+                    settings=Settings(allow_reset=False),
+                )
 
     return CHROMA_CLIENT
 
-def get_chunk_collection():
+def is_vector_store_ready() -> bool:
+    return CHROMA_CLIENT is not None
+
+def index_collection_name(embedding_model: str, dimension: int) -> str:
+    # Chroma names are limited to 63 chars of [a-zA-Z0-9._-], so keep a short
+    # readable slug and disambiguate with a hash of the full model name.
+    slug = re.sub(r"[^a-zA-Z0-9]+", "-", embedding_model).strip("-").lower()[:32]
+    digest = hashlib.sha1(embedding_model.encode("utf-8")).hexdigest()[:8]
+    return f"{COLLECTION_NAME}_{slug or 'model'}_{dimension}_{digest}"
+
+def get_chunk_collection(embedding_model: str | None = None, dimension: int | None = None):
     client = get_chroma_client()
-    return client.get_or_create_collection(name=COLLECTION_NAME)
+    if embedding_model is None or dimension is None:
+        # Legacy collection, written before indexes were tagged by model
+        return client.get_or_create_collection(name=COLLECTION_NAME)
+    return client.get_or_create_collection(
+        name=index_collection_name(embedding_model, dimension),
+        # Chunks and questions are both embedded through /api/embed; cosine
+        # space keeps ranking independent of vector norm
+        metadata={"embedding_model": embedding_model, "dimension": dimension, "hnsw:space": "cosine"},
+    )
 
-def _initialize():
+def legacy_index(embedding_model: str) -> dict:
+    # Untagged PDFs in the legacy collection, labelled with the model that built them
+    return {"embedding_model": embedding_model, "dimension": None, "legacy": True}
+
+def get_index_collection(index: dict | None):
+    if not index or index.get("legacy"):
+        return get_chunk_collection()
+    return get_chunk_collection(index["embedding_model"], index["dimension"])
+
+def ensure_data_dirs():
+    global _DATA_DIRS_READY
+
+    if _DATA_DIRS_READY:
+        return
     os.makedirs(PDF_DIR, exist_ok=True)
     os.makedirs(CHROMA_DIR, exist_ok=True)
+    os.makedirs(TEXT_DIR, exist_ok=True)
 
     if not os.path.exists(META_FILE):
         with open(META_FILE, "w", encoding="utf-8") as f:
             json.dump({"pdfs": {}}, f)
+    _DATA_DIRS_READY = True
 
+def initialize_vector_store():
+    """Open Chroma and make sure the legacy collection exists."""
     client = get_chroma_client()
 
     existing_collections = {c.name for c in client.list_collections()}
     if COLLECTION_NAME not in existing_collections:
         client.create_collection(name=COLLECTION_NAME)
-
-_initialize()
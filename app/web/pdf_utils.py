@@ -1,4 +1,4 @@
-from settings import BACKEND_URL
+from settings import BACKEND_URL, backend_headers
 import requests
 import streamlit as st
 
@@ -45,6 +45,7 @@ def upload_pdf(file):
                 f"{BACKEND_URL}/pdf/upload",
                 files=files,
                 data=data,
+                headers=backend_headers(),
                 timeout=605,
             )
         if r.status_code == 200:
@@ -70,7 +71,12 @@ def send_chat(pdf_id: str, question: str):
 
     try:
         with st.spinner("Thinking..."):
-            r = requests.post(f"{BACKEND_URL}/chat", json=payload, timeout=245)
+            r = requests.post(
+                f"{BACKEND_URL}/chat",
+                json=payload,
+                headers=backend_headers(),
+                timeout=245,
+            )
         if r.status_code == 200:
             data = r.json()
             st.session_state.chat_history = data.get("history", [])
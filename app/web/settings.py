@@ -1,3 +1,5 @@
+import uuid
+
 import requests
 import streamlit as st
 
@@ -23,6 +25,13 @@ def set_default_session():
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
 
+    # Identifies this browser session to the backend for fair Ollama queuing
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = uuid.uuid4().hex
+
+def backend_headers():
+    return {"X-User-Id": st.session_state.get("user_id", "")}
+
 def configure_setting():
     set_default_session()
     saved_settings = load_saved_setting()